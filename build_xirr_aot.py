@@ -0,0 +1,27 @@
+#!/usr/bin/env python3
+"""
+Ahead-of-time compile the XIRR solver into a `xirr_aot` extension module.
+
+The @njit(cache=True) kernels in aerodrome_cbbtc_usdc_analyzer still pay
+~1s of JIT compilation on the first call of a fresh environment, which
+dominates one-shot CLI runs. Building this module once:
+
+    python build_xirr_aot.py
+
+drops a compiled xirr_aot.*.so next to the analyzer; the analyzer picks it
+up automatically and falls back to the JIT (or plain Python) otherwise.
+"""
+from numba.pycc import CC
+
+from aerodrome_cbbtc_usdc_analyzer import _xirr_solve
+
+cc = CC('xirr_aot')
+
+# f8(deltas, cash_flows, low, high, tol, max_iter) -> annual rate or NaN
+cc.export('xirr_solve', 'f8(f8[:], f8[:], f8, f8, f8, i8)')(
+    getattr(_xirr_solve, 'py_func', _xirr_solve)
+)
+
+if __name__ == '__main__':
+    cc.compile()
+    print("Built xirr_aot extension module")
@@ -3,12 +3,83 @@
 Snippet: Find closest Swap event AT or AFTER a target block
 For Aerodrome Slipstream cbBTC-USDC pool on Base
 """
+import asyncio
 import os
+import numpy as np
 import requests
+import shelve
+import threading
 import time
-from decimal import Decimal, getcontext
-
-getcontext().prec = 50
+from bisect import bisect_left
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from fractions import Fraction
+from functools import lru_cache
+from requests.adapters import HTTPAdapter
+from urllib3.util import Retry
+
+try:
+    import httpx  # optional: HTTP/2 multiplexed fetching for large scans
+except ImportError:
+    httpx = None
+
+try:
+    import orjson  # optional: ~3x faster than stdlib json on log arrays
+except ImportError:
+    orjson = None
+
+try:
+    from numba import njit, prange
+except ImportError:
+    def njit(*args, **kwargs):
+        """No-op stand-in so the price kernels still run as plain Python"""
+        def wrap(func):
+            return func
+        return wrap
+    prange = range
+
+def _loads(response):
+    """Parse a response body, preferring orjson over the stdlib decoder"""
+    if orjson is not None:
+        return orjson.loads(response.content)
+    return response.json()
+
+# Shared keep-alive session: one TLS handshake reused across every call.
+# Retries run inside the connection pool (429/5xx with backoff), so callers
+# issue a single get() and never sleep in Python.
+_RETRY = Retry(
+    total=3,
+    backoff_factor=0.5,
+    status_forcelist=(429, 500, 502, 503, 504),
+    allowed_methods=frozenset(["GET"]),
+    respect_retry_after_header=True,
+)
+_SESSION = requests.Session()
+_SESSION.headers["Connection"] = "keep-alive"
+_SESSION.mount("https://", HTTPAdapter(max_retries=_RETRY, pool_connections=4, pool_maxsize=16))
+
+class _RateLimiter:
+    """Token bucket spacing calls to stay under Etherscan's 5 req/s limit"""
+
+    def __init__(self, per_second=5.0):
+        self.interval = 1.0 / per_second
+        self._lock = threading.Lock()
+        self._next_slot = 0.0
+
+    def reserve(self):
+        """Claim the next send slot; returns how long to wait before it opens"""
+        with self._lock:
+            now = time.monotonic()
+            delay = self._next_slot - now
+            self._next_slot = max(now, self._next_slot) + self.interval
+        return max(delay, 0.0)
+
+    def wait(self):
+        delay = self.reserve()
+        if delay > 0:
+            time.sleep(delay)
+
+_rate_limiter = _RateLimiter(5.0)
 
 # Configuration
 POOL_ADDRESS = "0x4e962BB3889Bf030368F56810A9c96B83CB3E778"  # cbBTC-USDC Slipstream pool
@@ -20,13 +91,51 @@ CHAIN_ID = 8453  # Base
 CBBTC_DECIMALS = 8
 USDC_DECIMALS = 6
 
-def fetch_swaps_near_block(target_block, search_range=200):
+# Price constants, computed once at import: 2^192 from the sqrtPriceX96
+# fixed-point format and the cbBTC->USDC decimal adjustment
+_Q192 = 1 << 192
+_SCALE = 10 ** (CBBTC_DECIMALS - USDC_DECIMALS)
+_NUM = _Q192 * _SCALE
+
+# Finalized log ranges are immutable, so cache them forever: in-process
+# dict first, then a shelve file so repeated backtest runs skip HTTP.
+# Ranges within _FINALITY_DEPTH blocks of head may still reorg and are
+# never cached.
+_CACHE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.swap_log_cache')
+_FINALITY_DEPTH = 64
+_log_cache = {}
+# shelve backends aren't safe under concurrent writers (dbm.dumb can
+# corrupt the file without raising), so all access goes through one lock
+_cache_lock = threading.Lock()
+_head_block = None
+
+def _chain_head():
+    """Current head block number, fetched once per process (None on failure)"""
+    global _head_block
+    if _head_block is None:
+        params = {
+            'chainid': CHAIN_ID,
+            'module': 'proxy',
+            'action': 'eth_blockNumber',
+            'apikey': API_KEY
+        }
+        try:
+            _rate_limiter.wait()
+            response = _SESSION.get(BASE_URL, params=params, timeout=30)
+            _head_block = int(_loads(response)['result'], 16)
+        except (requests.RequestException, KeyError, ValueError):
+            return None
+    return _head_block
+
+def fetch_swaps_near_block(target_block, search_range=200, first_match=False):
     """
     Fetch Swap events AT or AFTER the target block
 
     Args:
         target_block: Block number of your LP event
         search_range: How many blocks ahead to search
+        first_match: Ask the server for only the earliest matching log
+            (sort=asc, offset=1, toBlock=latest) instead of a fixed window
 
     Returns:
         List of swap log events
@@ -34,6 +143,18 @@ def fetch_swaps_near_block(target_block, search_range=200):
     from_block = target_block  # Start AT the target block
     to_block = target_block + search_range  # Look ahead
 
+    if not first_match:
+        cache_key = f"{from_block}-{to_block}-{POOL_ADDRESS}-{SWAP_TOPIC}"
+        if cache_key in _log_cache:
+            return _log_cache[cache_key]
+        try:
+            with _cache_lock, shelve.open(_CACHE_FILE) as db:
+                if cache_key in db:
+                    _log_cache[cache_key] = db[cache_key]
+                    return _log_cache[cache_key]
+        except OSError:
+            pass
+
     params = {
         'chainid': CHAIN_ID,
         'module': 'logs',
@@ -44,28 +165,104 @@ def fetch_swaps_near_block(target_block, search_range=200):
         'toBlock': to_block,
         'apikey': API_KEY
     }
+    if first_match:
+        # Server-side trim: one tiny response with the earliest swap
+        # at-or-after the target, no window guessing. 'latest' is not a
+        # stable range, so this mode bypasses the range cache.
+        params.update({'toBlock': 'latest', 'sort': 'asc', 'page': 1, 'offset': 1})
+
+    try:
+        _rate_limiter.wait()
+        response = _SESSION.get(BASE_URL, params=params, timeout=30)
+        data = _loads(response)
+    except (requests.RequestException, ValueError, KeyError) as e:
+        # ValueError also covers JSON decode errors on non-JSON bodies
+        # (gateway HTML pages and the like)
+        print(f"Error: {e}")
+        return []
+
+    if data.get('status') == '1':
+        logs = data.get('result', [])
+        if first_match:
+            return logs
+        head = _chain_head()
+        if head is not None and to_block <= head - _FINALITY_DEPTH:
+            _log_cache[cache_key] = logs
+            try:
+                with _cache_lock, shelve.open(_CACHE_FILE) as db:
+                    db[cache_key] = logs
+            except OSError:
+                pass
+        return logs
+
+    print(f"API Error: {data.get('message', 'Unknown error')}")
+    return []
 
-    retries = 3
-    for attempt in range(retries):
-        try:
-            response = requests.get(BASE_URL, params=params, timeout=30)
-            data = response.json()
-
-            if data['status'] == '1':
-                return data.get('result', [])
-            elif 'rate limit' in data.get('message', '').lower():
-                time.sleep((attempt + 1) * 2)
-            else:
-                print(f"API Error: {data.get('message', 'Unknown error')}")
-                return []
-        except Exception as e:
-            print(f"Error: {e}")
-            if attempt < retries - 1:
-                time.sleep(2)
+def fetch_swaps_for_blocks(targets, search_range=200):
+    """
+    Fetch the first Swap log at or after each of several target blocks,
+    coalescing overlapping search windows into single getLogs calls
 
-    return []
+    N targets whose windows overlap cost one HTTP round trip, not N.
+
+    Args:
+        targets: Iterable of block numbers (one per LP event)
+        search_range: How many blocks ahead of each target to search
+
+    Returns:
+        Dict mapping each target block to its first log at-or-after,
+        or None where no swap landed inside the window
+    """
+    targets = sorted(set(targets))
+    results = {t: None for t in targets}
+    if not targets:
+        return results
+
+    # Merge targets whose [target, target+range] windows overlap or touch
+    intervals = []  # (from_block, to_block, [targets covered])
+    cur_from, cur_to, cur_targets = targets[0], targets[0] + search_range, [targets[0]]
+    for t in targets[1:]:
+        if t <= cur_to:
+            cur_to = max(cur_to, t + search_range)
+            cur_targets.append(t)
+        else:
+            intervals.append((cur_from, cur_to, cur_targets))
+            cur_from, cur_to, cur_targets = t, t + search_range, [t]
+    intervals.append((cur_from, cur_to, cur_targets))
+
+    for from_block, to_block, covered in intervals:
+        logs = fetch_swaps_near_block(from_block, to_block - from_block)
+        if len(logs) >= 1000:
+            # Un-paginated getLogs responses are capped at 1000 records,
+            # so this merged window is likely truncated and demuxing it
+            # would silently map later targets to None or the wrong log.
+            # Fall back to per-target fetches: each response ascends from
+            # its own fromBlock, so its first record is always correct.
+            for t in covered:
+                t_logs = fetch_swaps_near_block(t, search_range)
+                if t_logs:
+                    results[t] = t_logs[0]
+            continue
+        blocks = [int(log['blockNumber'], 16) for log in logs]
+        for t in covered:
+            i = bisect_left(blocks, t)
+            if i < len(logs):
+                results[t] = logs[i]
+
+    return results
+
+@lru_cache(maxsize=4096)
+def tick_to_price(tick):
+    """
+    cbBTC price in USDC for a pool tick (Uniswap-v3 ratio 1.0001^tick)
+
+    Swaps cluster in a narrow tick band, so memoizing by tick makes
+    repeated price lookups near-free. Tick granularity is 0.01%, well
+    below USD display precision.
+    """
+    return _SCALE / 1.0001 ** tick
 
-def decode_swap_price(log):
+def decode_swap_price(log, exact=False):
     """
     Decode cbBTC price from Swap event
 
@@ -77,36 +274,29 @@ def decode_swap_price(log):
     - data[256:320]:  tick
 
     Returns:
-        Dict with block, tx_hash, tick, and cbbtc_price
+        Dict with block, tx_hash, tick, and cbbtc_price (a float, or an
+        exact Fraction when exact=True)
     """
     block = int(log['blockNumber'], 16)
     tx_hash = log['transactionHash']
 
-    # Extract sqrtPriceX96 from data field
-    data = log['data'][2:]  # Remove '0x' prefix
-    sqrtPriceX96_hex = data[128:192]  # Bytes 64-95 (hex chars 128-191)
-    tick_hex = data[256:320]  # Bytes 128-159 (hex chars 256-319)
+    # Cheap length check up front: malformed logs fail here instead of
+    # deep inside the arithmetic ('0x' + 5 words = 322 hex chars)
+    if len(log['data']) < 322:
+        raise ValueError("short swap data")
 
-    # Convert tick (signed integer)
-    def hex_to_signed_int(hex_str):
-        val = int(hex_str, 16)
-        if val >= 2**255:  # If high bit set, it's negative
-            val -= 2**256
-        return val
+    # Parse the data payload once; field offsets per the layout above
+    raw = bytes.fromhex(log['data'][2:])
+    tick = int.from_bytes(raw[128:160], 'big', signed=True)
 
-    sqrtPriceX96 = int(sqrtPriceX96_hex, 16)
-    tick = hex_to_signed_int(tick_hex)
-
-    # Calculate price from sqrtPriceX96
-    # Formula: price = (sqrtPriceX96 / 2^96)^2
-    Q96 = Decimal(2**96)
-    sqrt_price = Decimal(sqrtPriceX96) / Q96
-    price_ratio = sqrt_price ** 2  # This is USDC per cbBTC
-
-    # Convert to cbBTC price in USDC
-    # Adjust for decimal differences (cbBTC=8, USDC=6)
-    decimal_adjustment = Decimal(10 ** (CBBTC_DECIMALS - USDC_DECIMALS))
-    cbbtc_price = (Decimal(1) / price_ratio) * decimal_adjustment
+    if exact:
+        # Audit path: exact big-int price from sqrtPriceX96,
+        # 2^192 * 10^(8-6) / sqrtPriceX96^2 as a Fraction
+        sqrtPriceX96 = int.from_bytes(raw[64:96], 'big')
+        cbbtc_price = Fraction(_NUM, sqrtPriceX96 * sqrtPriceX96)
+    else:
+        # Display path: tick-keyed memo skips the 192-bit squaring
+        cbbtc_price = tick_to_price(tick)
 
     return {
         'block': block,
@@ -115,51 +305,242 @@ def decode_swap_price(log):
         'cbbtc_price': cbbtc_price
     }
 
-def find_closest_swap(target_block, search_range=200):
+async def fetch_swaps_near_block_async(client, target_block, search_range=200):
     """
-    Find the closest Swap AT or immediately AFTER target block
+    Async variant of fetch_swaps_near_block for an httpx.AsyncClient
 
     Args:
+        client: Open httpx.AsyncClient
         target_block: Block number of your LP event
         search_range: How many blocks ahead to search
 
     Returns:
-        Dict with swap details or None if not found
+        List of swap log events
     """
-    # Fetch swap logs
-    swap_logs = fetch_swaps_near_block(target_block, search_range)
+    params = {
+        'chainid': CHAIN_ID,
+        'module': 'logs',
+        'action': 'getLogs',
+        'address': POOL_ADDRESS,
+        'topic0': SWAP_TOPIC,
+        'fromBlock': target_block,
+        'toBlock': target_block + search_range,
+        'apikey': API_KEY
+    }
 
-    if not swap_logs:
-        print(f"No swaps found near block {target_block}")
-        return None
+    try:
+        # Same token bucket as the sync path, but yield to the loop
+        # instead of blocking it
+        await asyncio.sleep(_rate_limiter.reserve())
+        response = await client.get(BASE_URL, params=params, timeout=30)
+        data = _loads(response)
+    except (httpx.HTTPError, ValueError, KeyError) as e:
+        print(f"Error: {e}")
+        return []
+
+    if data.get('status') == '1':
+        return data.get('result', [])
+
+    print(f"API Error: {data.get('message', 'Unknown error')}")
+    return []
 
-    # Decode all swaps
-    swaps = []
-    for log in swap_logs:
+def fetch_swaps_for_blocks_http2(targets, search_range=200, workers=8):
+    """
+    Fetch windows for many targets multiplexed over one HTTP/2 connection
+
+    Etherscan is a single host, so one connection with stream multiplexing
+    beats a keep-alive pool once the scan covers hundreds of LP events.
+    Falls back to sequential sync fetches when httpx is not installed.
+
+    Args:
+        targets: Iterable of block numbers
+        search_range: How many blocks ahead of each target to search
+        workers: Maximum requests in flight; the shared token bucket still
+            spaces sends under the API rate limit
+
+    Returns:
+        Dict mapping each target block to its raw log list
+    """
+    targets = list(targets)
+    if httpx is None:
+        return {t: fetch_swaps_near_block(t, search_range) for t in targets}
+
+    async def _gather():
+        limits = httpx.Limits(max_connections=1, max_keepalive_connections=1)
+        sem = asyncio.Semaphore(workers)
+
+        async def _one(client, t):
+            async with sem:
+                return await fetch_swaps_near_block_async(client, t, search_range)
+
+        async with httpx.AsyncClient(http2=True, limits=limits) as client:
+            return await asyncio.gather(*(_one(client, t) for t in targets))
+
+    return dict(zip(targets, asyncio.run(_gather())))
+
+@njit(cache=True, fastmath=True)
+def _price_from_sqrt(sp, dec_adj):
+    """Float64 price from sqrtPriceX96: dec_adj / (sp / 2^96)^2"""
+    ratio = sp / 79228162514264337593543950336.0  # 2^96
+    return dec_adj / (ratio * ratio)
+
+@njit(cache=True, fastmath=True, parallel=True)
+def _price_from_sqrt_arr(sps, dec_adj, out):
+    """Batched _price_from_sqrt over parallel lanes"""
+    for i in prange(sps.shape[0]):
+        ratio = sps[i] / 79228162514264337593543950336.0
+        out[i] = dec_adj / (ratio * ratio)
+
+@dataclass
+class SwapBatch:
+    """Decoded swaps in columnar (structure-of-arrays) layout"""
+    blocks: np.ndarray   # int64, ascending
+    ticks: np.ndarray    # int64
+    prices: np.ndarray   # float64
+
+    def __len__(self):
+        return len(self.blocks)
+
+    def __getitem__(self, i):
+        return {
+            'block': int(self.blocks[i]),
+            'tick': int(self.ticks[i]),
+            'cbbtc_price': float(self.prices[i])
+        }
+
+    def first_at_or_after(self, target_block):
+        """First swap at or after target_block in O(log N), or None"""
+        i = int(np.searchsorted(self.blocks, target_block, side='left'))
+        return self[i] if i < len(self.blocks) else None
+
+def decode_swaps(logs, precise=False):
+    """
+    Decode a whole batch of Swap logs at once
+
+    Bulk path for backtests: per-log Python dicts and Decimal arithmetic are
+    skipped; prices come from exact big-int division cast to float64.
+    Columnar output means downstream filters are vectorized masks and
+    block lookups are searchsorted, not linear scans.
+
+    Args:
+        logs: List of raw Swap log events
+        precise: Compute prices with exact big-int division instead of
+            the JIT float64 kernel (identical to ~15 digits)
+
+    Returns:
+        SwapBatch of parallel block/tick/price arrays
+    """
+    # Same fail-fast length check as decode_swap_price: truncated payloads
+    # are dropped here rather than aborting the batch or, worse, slicing
+    # into the wrong field
+    logs = [log for log in logs if len(log['data']) >= 322]
+
+    n = len(logs)
+    blocks = np.empty(n, dtype=np.int64)
+    ticks = np.empty(n, dtype=np.int64)
+    sps = np.empty(n, dtype=np.float64)
+    prices = np.empty(n, dtype=np.float64)
+
+    for i, log in enumerate(logs):
+        raw = bytes.fromhex(log['data'][2:])
+        sqrtPriceX96 = int.from_bytes(raw[64:96], 'big')
+        blocks[i] = int(log['blockNumber'], 16)
+        ticks[i] = int.from_bytes(raw[128:160], 'big', signed=True)
+        if precise:
+            prices[i] = _NUM / (sqrtPriceX96 * sqrtPriceX96)
+        else:
+            sps[i] = sqrtPriceX96
+
+    if not precise:
+        _price_from_sqrt_arr(sps, float(_SCALE), prices)
+
+    return SwapBatch(blocks, ticks, prices)
+
+def _locate_closest_swap(target_block, search_range):
+    """Pure lookup half of find_closest_swap: no printing, safe to memoize"""
+    # Let the server trim to the first match; if that mode returns nothing
+    # fall back to exponential windows (200 -> 800 -> 3200 -> 12800),
+    # which also serve warm runs from the range cache
+    swap_logs = fetch_swaps_near_block(target_block, first_match=True)
+    if not swap_logs:
+        for rng in (search_range, search_range * 4, search_range * 16, search_range * 64):
+            swap_logs = fetch_swaps_near_block(target_block, rng)
+            if swap_logs:
+                break
+
+    # Drop anomalous logs before decoding so they never cost an exception
+    swap_logs = [log for log in swap_logs if len(log['data']) >= 322]
+
+    # Logs arrive block-ordered ascending: bisect to the first one
+    # at-or-after the target and decode from there; everything behind it
+    # never needs decoding
+    blocks = [int(log['blockNumber'], 16) for log in swap_logs]
+    for log in swap_logs[bisect_left(blocks, target_block):]:
         try:
-            swap = decode_swap_price(log)
-            swaps.append(swap)
-        except Exception as e:
-            print(f"Error decoding swap: {e}")
+            return decode_swap_price(log)
+        except (ValueError, KeyError):
             continue
 
-    # Find swap AT the exact block
-    at_block_swaps = [s for s in swaps if s['block'] == target_block]
-    if at_block_swaps:
-        swap = at_block_swaps[0]  # Use first swap at this block
+    return None
+
+def _report_swap(swap, target_block):
+    """Lookup outcome prints, kept out of the memoized path"""
+    if swap is None:
+        print(f"No swap found at or after block {target_block}")
+    elif swap['block'] == target_block:
         print(f"Found swap AT block {target_block}")
-        return swap
+    else:
+        print(f"Found swap {swap['block'] - target_block} blocks after (block {swap['block']})")
 
-    # Find first swap AFTER the block
-    after_block_swaps = [s for s in swaps if s['block'] > target_block]
-    if after_block_swaps:
-        swap = min(after_block_swaps, key=lambda s: s['block'])  # Closest one
-        blocks_away = swap['block'] - target_block
-        print(f"Found swap {blocks_away} blocks after (block {swap['block']})")
-        return swap
+_swap_memo = {}
+_SWAP_MEMO_MAX = 8192
 
-    print(f"No swap found at or after block {target_block}")
-    return None
+def find_closest_swap(target_block, search_range=200):
+    """
+    Find the closest Swap AT or immediately AFTER target block
+
+    Results on finalized history are memoized per (target_block,
+    search_range); lookups resolving inside the reorg window stay
+    uncached and are re-resolved on the next call.
+
+    Args:
+        target_block: Block number of your LP event
+        search_range: Initial window; widened 4x up to 64x if no swap lands
+
+    Returns:
+        Dict with swap details or None if not found
+    """
+    key = (target_block, search_range)
+    swap = _swap_memo.get(key)
+    if swap is None:
+        swap = _locate_closest_swap(target_block, search_range)
+        head = _chain_head()
+        if (swap is not None and head is not None
+                and swap['block'] <= head - _FINALITY_DEPTH):
+            if len(_swap_memo) >= _SWAP_MEMO_MAX:
+                _swap_memo.clear()
+            _swap_memo[key] = swap
+
+    _report_swap(swap, target_block)
+    return swap
+
+def find_closest_swaps(targets, search_range=200, workers=8):
+    """
+    Look up the closest swap for many target blocks concurrently
+
+    The work is pure HTTP I/O on the shared keep-alive pool, so threads
+    scale until the rate limiter becomes the bottleneck.
+
+    Args:
+        targets: Iterable of block numbers (one per LP event)
+        search_range: How many blocks ahead of each target to search
+        workers: Thread count (keep at or below the session pool size)
+
+    Returns:
+        List of swap dicts (or None) in the same order as targets
+    """
+    with ThreadPoolExecutor(max_workers=workers) as ex:
+        return list(ex.map(lambda t: find_closest_swap(t, search_range), targets))
 
 # Example usage
 if __name__ == "__main__":